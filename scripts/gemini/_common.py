@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the Gemini scripts
+- .env loading from the repo root
+- one keep-alive HTTP session shared by all API calls
+- a generate() helper for the generateContent endpoint
+"""
+
+import functools
+import os
+import re
+import socket
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+try:
+    import orjson
+
+    def json_dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+
+    def json_loads(raw):
+        return orjson.loads(raw)
+except ImportError:  # stdlib fallback, same bytes-in/bytes-out contract
+    import json
+
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode('utf-8')
+
+    def json_loads(raw):
+        return json.loads(raw)
+
+# Root .env shared by every script, resolved once at import so no call
+# site re-walks the parent chain (or follows symlinks) per invocation
+DOTENV_PATH = Path(__file__).resolve().parent.parent.parent / ".env"
+
+# KEY=value per line; comments and blank lines never match. Only
+# horizontal whitespace around '=' - \s would cross newlines under re.M
+# and let an empty value swallow the following line. Quoted values may
+# span lines (the alternation tries them first), matching the
+# continuation handling the baseline test-gemini-key.py parser had
+_ENV_RE = re.compile(
+    r'^[ \t]*([A-Za-z_]\w*)[ \t]*=[ \t]*("[^"]*"|\'[^\']*\'|.*?)[ \t]*$',
+    re.M,
+)
+_QUOTE_RE = re.compile(r'^["\']?(.*?)["\']?$', re.S)
+
+API_HOST = "generativelanguage.googleapis.com"
+API_BASE = f"https://{API_HOST}/v1beta/models"
+
+# One keep-alive session shared by every script and thread, so repeated
+# calls reuse a single TCP/TLS connection. Transient 429/5xx responses
+# are retried with backoff instead of failing the whole script run.
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=10,
+    max_retries=Retry(
+        total=2,
+        backoff_factor=0.2,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=['POST'],
+        # Exhausted retries must return the final response, not raise
+        # RetryError - callers map 429 to "rate limited but valid"
+        raise_on_status=False,
+    ),
+))
+
+# Warm the OS resolver cache so the first API call doesn't pay DNS lookup
+try:
+    socket.getaddrinfo(API_HOST, 443)
+except OSError:
+    pass  # offline - the API call itself will report the failure
+
+class GeminiError(Exception):
+    """generateContent returned a non-200 status"""
+    def __init__(self, code: int, body: str):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+        self.body = body
+
+class AsyncByteReader:
+    """Minimal async file-like wrapper so ijson can consume an httpx byte stream"""
+    def __init__(self, aiterator):
+        self._aiterator = aiterator
+
+    async def read(self, size=-1):
+        try:
+            return await self._aiterator.__anext__()
+        except StopAsyncIteration:
+            return b""
+
+@functools.lru_cache(maxsize=1)
+def load_env() -> dict:
+    """Load environment variables from the root .env file
+
+    Parsed once per process; call load_env.cache_clear() after
+    rewriting the .env file.
+    """
+    env_vars = {}
+    if DOTENV_PATH.exists():
+        text = DOTENV_PATH.read_text()
+        env_vars = {
+            key: _QUOTE_RE.match(value).group(1)
+            for key, value in _ENV_RE.findall(text)
+        }
+        os.environ.update(env_vars)
+    return env_vars
+
+def generate(model: str, api_key: str, text: str, max_tokens: int = 10,
+             temperature: float = 0.1, timeout: int = 10,
+             probe_only: bool = False) -> dict:
+    """Call generateContent on a model, return parsed JSON or raise GeminiError
+
+    With probe_only the call asks for a single output token - enough to
+    prove the model is reachable without paying for (or waiting on) a
+    real completion. Such probes finish with MAX_TOKENS, which callers
+    should treat as success.
+    """
+    url = f"{API_BASE}/{model}:generateContent?key={api_key}"
+
+    generation_config = {
+        "temperature": temperature,
+        "maxOutputTokens": 1 if probe_only else max_tokens,
+    }
+    if probe_only:
+        generation_config["candidateCount"] = 1
+
+    data = {
+        "contents": [{
+            "parts": [{
+                "text": text
+            }]
+        }],
+        "generationConfig": generation_config,
+    }
+
+    r = SESSION.post(url, data=json_dumps(data),
+                     headers={'Content-Type': 'application/json'}, timeout=timeout)
+
+    if r.status_code != 200:
+        raise GeminiError(r.status_code, r.text)
+
+    return json_loads(r.content)
@@ -6,28 +6,17 @@ Gemini API Key Helper
 - Set up .env file
 """
 
-import os
+import asyncio
 import sys
-import json
-import urllib.request
-import urllib.parse
-import webbrowser
 from pathlib import Path
 
-def load_env():
-    """Load environment variables from .env file"""
-    dotenv_path = Path(__file__).parent.parent.parent / ".env"
-    env_vars = {}
-    if dotenv_path.exists():
-        with open(dotenv_path, "r") as f:
-            for line in f:
-                line = line.strip()
-                if line.startswith("#") or not line or "=" not in line:
-                    continue
-                key, _, value = line.partition("=")
-                value = value.strip('"\'')
-                env_vars[key.strip()] = value.strip()
-    return env_vars, dotenv_path
+import httpx
+
+from _common import API_BASE, DOTENV_PATH, GeminiError, generate, load_env
+
+def _mask(key: str) -> str:
+    """Mask an API key for display, keeping just enough to identify it"""
+    return f"{key[:8]}...{key[-4:]}" if len(key) > 12 else f"{key[:6]}..."
 
 def save_env(env_vars: dict, dotenv_path: Path):
     """Save environment variables to .env file"""
@@ -35,67 +24,102 @@ def save_env(env_vars: dict, dotenv_path: Path):
         f.write("# Gemini API Keys\n")
         for key, value in env_vars.items():
             f.write(f"{key}={value}\n")
+    # The file changed on disk, so the memoized parse is stale
+    load_env.cache_clear()
+
+_TEST_PROMPT = "Say 'API key is working' in one sentence."
+
+def _status_message(code: int) -> str:
+    """Map an HTTP status to the validation message shown to the user"""
+    if code == 400:
+        return "Invalid API key format"
+    elif code == 403:
+        return "API key denied - check permissions"
+    elif code == 429:
+        return "Rate limited - key might be valid"
+    else:
+        return f"HTTP {code} error"
+
+def _extract_response(result: dict) -> tuple[bool, str]:
+    """Pull the generated sentence out of a successful response
+
+    Content-first with the same fallback chain as the model test
+    scripts; a 200 with an unexpected shape reports as invalid instead
+    of crashing the interactive flow.
+    """
+    try:
+        return True, result['candidates'][0]['content']['parts'][0]['text'].strip()
+    except (KeyError, IndexError, TypeError):
+        try:
+            return True, result['candidates'][0]['parts'][0]['text'].strip()
+        except (KeyError, IndexError, TypeError):
+            return False, "No response generated"
 
 def test_api_key(api_key: str) -> tuple[bool, str]:
     """Test if an API key is valid"""
     try:
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={api_key}"
-        
-        data = {
-            "contents": [{
-                "parts": [{
-                    "text": "Say 'API key is working' in one sentence."
-                }]
-            }],
-            "generationConfig": {
-                "temperature": 0.1,
-                "maxOutputTokens": 20,
-            }
+        result = generate("gemini-2.5-flash", api_key, _TEST_PROMPT, max_tokens=20)
+    except GeminiError as e:
+        return False, _status_message(e.code)
+    except Exception as e:
+        return False, f"Connection error: {str(e)[:50]}..."
+
+    return _extract_response(result)
+
+async def test_api_key_async(client: "httpx.AsyncClient", api_key: str) -> tuple[bool, str]:
+    """Async variant of test_api_key for bulk validation over one client"""
+    url = f"{API_BASE}/gemini-2.5-flash:generateContent?key={api_key}"
+
+    data = {
+        "contents": [{
+            "parts": [{
+                "text": _TEST_PROMPT
+            }]
+        }],
+        "generationConfig": {
+            "temperature": 0.1,
+            "maxOutputTokens": 20,
         }
-        
-        req = urllib.request.Request(
-            url,
-            data=json.dumps(data).encode('utf-8'),
-            headers={'Content-Type': 'application/json'}
-        )
-        
-        with urllib.request.urlopen(req, timeout=10) as response:
-            result = json.loads(response.read().decode('utf-8'))
-        
-        if 'candidates' in result and len(result['candidates']) > 0:
-            response_text = result['candidates'][0]['parts'][0]['text'].strip()
-            return True, response_text
-        else:
-            return False, "No response generated"
-            
-    except urllib.error.HTTPError as e:
-        if e.code == 400:
-            return False, "Invalid API key format"
-        elif e.code == 403:
-            return False, "API key denied - check permissions"
-        elif e.code == 429:
-            return False, "Rate limited - key might be valid"
-        else:
-            return False, f"HTTP {e.code} error"
+    }
+
+    try:
+        r = await client.post(url, json=data)
     except Exception as e:
         return False, f"Connection error: {str(e)[:50]}..."
 
-def print_colored(text: str, color: str = '\033[0m'):
+    if r.status_code != 200:
+        return False, _status_message(r.status_code)
+
+    # Nothing here may raise: an exception would propagate through
+    # asyncio.gather and abort validation for every other key
+    try:
+        result = r.json()
+    except ValueError:
+        return False, "No response generated"
+    return _extract_response(result)
+
+# ANSI escapes, built once instead of per print_colored call
+_COLORS = {
+    'red': '\033[91m',
+    'green': '\033[92m',
+    'yellow': '\033[93m',
+    'blue': '\033[94m',
+    'cyan': '\033[96m',
+    'white': '\033[97m',
+    'bold': '\033[1m',
+    'reset': '\033[0m'
+}
+_RESET = _COLORS['reset']
+
+def print_colored(text: str, color: str = 'reset'):
     """Print colored text"""
-    colors = {
-        'red': '\033[91m',
-        'green': '\033[92m',
-        'yellow': '\033[93m',
-        'blue': '\033[94m',
-        'cyan': '\033[96m',
-        'white': '\033[97m',
-        'bold': '\033[1m',
-        'reset': '\033[0m'
-    }
-    print(f"{colors.get(color, '')}{text}{colors['reset']}")
+    print(f"{_COLORS.get(color, '')}{text}{_RESET}")
 
 def open_browser(url: str):
     """Open URL in browser"""
+    # Imported lazily: webbrowser probes the platform for a browser on
+    # import, and most menu options never need it
+    import webbrowser
     try:
         webbrowser.open(url)
         return True
@@ -138,7 +162,9 @@ def guide_key_creation():
 
 def interactive_key_setup():
     """Interactive API key setup"""
-    env_vars, dotenv_path = load_env()
+    # Copy before mutating: load_env() returns the lru_cached dict, and
+    # keys the user declines to save must not linger in it
+    env_vars = dict(load_env())
     
     print_colored("🔧 API Key Setup", 'bold')
     print_colored("=" * 20, 'blue')
@@ -154,8 +180,7 @@ def interactive_key_setup():
     print("Current keys in .env:")
     for key_name, key_value in existing_keys.items():
         if key_value:
-            masked = key_value[:8] + '...' + key_value[-4:] if len(key_value) > 12 else key_value[:6] + '...'
-            print(f"  {key_name}: {masked}")
+            print(f"  {key_name}: {_mask(key_value)}")
         else:
             print(f"  {key_name}: Not set")
     
@@ -192,30 +217,41 @@ def interactive_key_setup():
     
     # Save to .env
     if input("Save changes to .env file? (Y/n): ").lower() != 'n':
-        save_env(env_vars, dotenv_path)
-        print_colored(f"✅ Saved to {dotenv_path}", 'green')
+        save_env(env_vars, DOTENV_PATH)
+        print_colored(f"✅ Saved to {DOTENV_PATH}", 'green')
 
 def validate_existing_keys():
     """Validate all existing API keys"""
-    env_vars, _ = load_env()
+    env_vars = load_env()
     
     print_colored("🧪 Validating Existing Keys", 'bold')
     print_colored("=" * 30, 'blue')
     print()
     
     keys_to_test = ['GEMINI_KEY', 'GEMINI_KEY_SECONDARY', 'GEMINI_KEY_FALLBACK']
-    
-    for key_name in keys_to_test:
-        api_key = env_vars.get(key_name)
+    present = [(key_name, env_vars.get(key_name)) for key_name in keys_to_test]
+    to_run = [(key_name, api_key) for key_name, api_key in present if api_key]
+
+    # Validate all keys at once over one HTTP/2 client instead of
+    # blocking on each key in turn
+    async def _run():
+        async with httpx.AsyncClient(http2=True, timeout=10) as client:
+            return await asyncio.gather(*(test_api_key_async(client, api_key)
+                                          for _, api_key in to_run))
+
+    outcomes = dict(zip([key_name for key_name, _ in to_run],
+                        asyncio.run(_run()))) if to_run else {}
+
+    # Report in the original key order
+    for key_name, api_key in present:
         if not api_key:
             print(f"{key_name}: Not set")
             continue
-        
-        masked = api_key[:8] + '...' + api_key[-4:] if len(api_key) > 12 else api_key[:6] + '...'
-        print(f"{key_name} ({masked}): ", end="")
-        
-        is_valid, message = test_api_key(api_key)
-        
+
+        print(f"{key_name} ({_mask(api_key)}): ", end="")
+
+        is_valid, message = outcomes[key_name]
+
         if is_valid:
             print_colored(f"✅ Valid - {message}", 'green')
         else:
@@ -256,4 +292,4 @@ def main():
         print("\n" + "="*50 + "\n")
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -4,41 +4,23 @@ Test script to compare different Gemini models for changelog generation
 """
 
 import os
-import json
-import urllib.request
-import urllib.parse
+import sys
+import asyncio
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 
-# ----------------------------
-# Load .env from parent directory
-# ----------------------------
-def load_env():
-    """Load environment variables from .env file"""
-    dotenv_path = Path(__file__).parent.parent.parent / ".env"
-    if dotenv_path.exists():
-        print(f"Loading .env from: {dotenv_path}")
-        with open(dotenv_path, "r") as f:
-            for line in f:
-                line = line.strip()
-                if line.startswith("#") or not line or "=" not in line:
-                    continue
-                key, _, value = line.partition("=")
-                # Remove quotes if present
-                value = value.strip('"\'')
-                os.environ[key.strip()] = value.strip()
-        print("✅ .env file loaded")
-    else:
-        print(f"⚠️  No .env file found at: {dotenv_path}")
+import httpx
 
-# Load environment variables
-load_env()
+try:
+    import ijson
+except ImportError:  # optional - fall back to parsing the full body
+    ijson = None
 
-def test_model(model_name: str, api_key: str) -> str:
-    """Test a specific Gemini model"""
-    
-    system_prompt = """You are a technical changelog generator. Your job is to create a new changelog entry based on git commits and changes.
+from _common import AsyncByteReader, json_dumps, json_loads, load_env
+
+# The payload is identical for every model - build the prompt string and
+# the encoded request body once at module scope instead of per call
+SYSTEM_PROMPT = """You are a technical changelog generator. Your job is to create a new changelog entry based on git commits and changes.
 
 CRITICAL REQUIREMENTS:
 1. Follow the EXACT format of the existing changelog - no emojis, no fluff, pure technical content
@@ -77,7 +59,7 @@ OUTPUT FORMAT:
 
 Only include sections that have changes. If no changes for a section, omit it entirely."""
 
-    user_prompt = """Create a changelog entry for version 0.2.0 based on these changes:
+USER_PROMPT = """Create a changelog entry for version 0.2.0 based on these changes:
 
 CURRENT CHANGELOG FORMAT:
 ```
@@ -118,87 +100,123 @@ A       scripts/test-gemini-models.py
 
 Generate ONLY the new changelog entry for version 0.2.0 with today's date (2025-09-18). Match the existing style exactly - no emojis, no marketing language, just technical facts."""
 
+PROMPT_TEXT = f"{SYSTEM_PROMPT}\n\n{USER_PROMPT}"
+
+PAYLOAD_BYTES = json_dumps({
+    "contents": [{
+        "parts": [{
+            "text": PROMPT_TEXT
+        }]
+    }],
+    "generationConfig": {
+        "temperature": 0.1,
+        "topK": 1,
+        "topP": 0.8,
+        "maxOutputTokens": 1500,
+    }
+})
+
+HEADERS = {'Content-Type': 'application/json'}
+
+def parse_response(model_name: str, result: dict) -> str:
+    """Extract generated text from a parsed API response"""
+    if 'candidates' in result and len(result['candidates']) > 0:
+        candidate = result['candidates'][0]
+
+        # Check finish reason first
+        finish_reason = candidate.get('finishReason', 'UNKNOWN')
+        if finish_reason == 'MAX_TOKENS':
+            generated_content = f"Response truncated (hit token limit: {finish_reason})"
+        elif finish_reason == 'SAFETY':
+            generated_content = f"Response blocked by safety filters: {finish_reason}"
+        elif finish_reason == 'STOP':
+            # Normal completion - optimistic extraction; the nested key
+            # checks are the exception, not the rule
+            try:
+                generated_content = candidate['content']['parts'][0]['text'].strip()
+            except (KeyError, IndexError, TypeError):
+                try:
+                    generated_content = candidate['parts'][0]['text'].strip()
+                except (KeyError, IndexError, TypeError):
+                    generated_content = f"No text found (finish reason: {finish_reason})"
+        else:
+            generated_content = f"Unexpected finish reason: {finish_reason}"
+
+        # Clean up the response (remove markdown code blocks if present)
+        if generated_content.startswith('```'):
+            lines = generated_content.split('\n')
+            generated_content = '\n'.join(lines[1:-1])
+
+        return generated_content
+    else:
+        return f"❌ No content generated by {model_name}"
+
+async def stream_parse_response(model_name: str, response) -> str:
+    """Incrementally extract finishReason and the generated text
+
+    Stops reading as soon as both fields are seen instead of
+    materializing the whole response body (up to 1500 output tokens
+    plus safety ratings and usage metadata) as one dict tree.
+    """
+    finish_reason = None
+    text = None
+
+    events = ijson.parse_async(AsyncByteReader(response.aiter_bytes()))
+    async for prefix, event, value in events:
+        if prefix == 'candidates.item.finishReason':
+            finish_reason = value
+        elif prefix == 'candidates.item.content.parts.item.text':
+            text = value
+        if finish_reason is not None and text is not None:
+            break
+
+    if finish_reason is None:
+        return parse_response(model_name, {})
+
+    # Reuse the finish-reason handling on a minimal candidate shape
+    candidate = {'finishReason': finish_reason}
+    if text is not None:
+        candidate['content'] = {'parts': [{'text': text}]}
+    return parse_response(model_name, {'candidates': [candidate]})
+
+async def test_model(client: "httpx.AsyncClient", model_name: str, api_key: str) -> tuple:
+    """Test a specific Gemini model over the shared HTTP/2 client
+
+    Returns (model, result, duration_s); timing logs are printed by the
+    caller after the whole batch finishes so workers don't contend on
+    stdout mid-flight.
+    """
+    start = time.perf_counter_ns()
+
+    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent?key={api_key}"
+
     try:
-        # Prepare request
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent?key={api_key}"
-        
-        data = {
-            "contents": [{
-                "parts": [{
-                    "text": f"{system_prompt}\n\n{user_prompt}"
-                }]
-            }],
-            "generationConfig": {
-                "temperature": 0.1,
-                "topK": 1,
-                "topP": 0.8,
-                "maxOutputTokens": 1500,
-            }
-        }
-        
-        # Make request
-        req = urllib.request.Request(
-            url,
-            data=json.dumps(data).encode('utf-8'),
-            headers={'Content-Type': 'application/json'}
-        )
-        
-        with urllib.request.urlopen(req, timeout=30) as response:
-            result = json.loads(response.read().decode('utf-8'))
-        
-        if 'candidates' in result and len(result['candidates']) > 0:
-            candidate = result['candidates'][0]
-            
-            # Check finish reason first
-            finish_reason = candidate.get('finishReason', 'UNKNOWN')
-            if finish_reason == 'MAX_TOKENS':
-                generated_content = f"Response truncated (hit token limit: {finish_reason})"
-            elif finish_reason == 'SAFETY':
-                generated_content = f"Response blocked by safety filters: {finish_reason}"
-            elif finish_reason == 'STOP':
-                # Normal completion, try to extract text
-                if 'content' in candidate and 'parts' in candidate['content'] and len(candidate['content']['parts']) > 0:
-                    if 'text' in candidate['content']['parts'][0]:
-                        generated_content = candidate['content']['parts'][0]['text'].strip()
-                    else:
-                        generated_content = "No text in response content"
-                elif 'parts' in candidate and len(candidate['parts']) > 0:
-                    if 'text' in candidate['parts'][0]:
-                        generated_content = candidate['parts'][0]['text'].strip()
-                    else:
-                        generated_content = "No text in response parts"
+        if ijson is not None:
+            async with client.stream('POST', url, content=PAYLOAD_BYTES, headers=HEADERS) as response:
+                if response.status_code != 200:
+                    body = (await response.aread()).decode('utf-8', 'replace')
+                    result = f"❌ API error for {model_name}: {body[:100]}..."
                 else:
-                    generated_content = f"No text found (finish reason: {finish_reason})"
-            else:
-                generated_content = f"Unexpected finish reason: {finish_reason}"
-            
-            # Clean up the response (remove markdown code blocks if present)
-            if generated_content.startswith('```'):
-                lines = generated_content.split('\n')
-                generated_content = '\n'.join(lines[1:-1])
-            
-            return generated_content
+                    result = await stream_parse_response(model_name, response)
         else:
-            return f"❌ No content generated by {model_name}"
-            
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode('utf-8') if hasattr(e, 'read') else str(e)
-        return f"❌ API error for {model_name}: {error_body[:100]}..."
+            response = await client.post(url, content=PAYLOAD_BYTES, headers=HEADERS)
+            if response.status_code != 200:
+                result = f"❌ API error for {model_name}: {response.text[:100]}..."
+            else:
+                result = parse_response(model_name, json_loads(response.content))
     except Exception as e:
-        return f"❌ Error for {model_name}: {str(e)[:100]}..."
+        result = f"❌ Error for {model_name}: {str(e)[:100]}..."
 
-def test_model_parallel(model, api_key):
-    """Wrapper function for parallel testing"""
-    print(f"🚀 Starting {model}...")
-    start_time = time.time()
-    result = test_model(model, api_key)
-    duration = time.time() - start_time
-    print(f"✅ Completed {model} in {duration:.1f}s")
-    return model, result
+    duration_s = (time.perf_counter_ns() - start) / 1e9
+    return model_name, result, duration_s
 
 def main():
     """Test all available Gemini models in parallel"""
-    
+
+    # Loaded here rather than at import so importing the module for its
+    # helpers has no side effects on os.environ
+    load_env()
+
     # Get API key
     api_key = os.getenv('GEMINI_KEY')
     if not api_key:
@@ -216,23 +234,22 @@ def main():
     print(f"🚀 Running {len(models)} models in parallel...")
     print()
     
+    start = time.perf_counter_ns()
+
+    # Run all models concurrently over one multiplexed HTTP/2 connection
+    async def run_all():
+        async with httpx.AsyncClient(http2=True, timeout=30) as client:
+            return await asyncio.gather(*[test_model(client, model, api_key) for model in models])
+
+    completed = asyncio.run(run_all())
+    total_duration = (time.perf_counter_ns() - start) / 1e9
+
+    # Batch-print the timings once the parallel fan-in is done
     results = {}
-    start_time = time.time()
-    
-    # Run all models in parallel
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        # Submit all tasks
-        future_to_model = {
-            executor.submit(test_model_parallel, model, api_key): model 
-            for model in models
-        }
-        
-        # Collect results as they complete
-        for future in as_completed(future_to_model):
-            model, result = future.result()
-            results[model] = result
-    
-    total_duration = time.time() - start_time
+    for model, result, duration_s in completed:
+        print(f"✅ Completed {model} in {duration_s:.1f}s")
+        results[model] = result
+
     print()
     print(f"🎉 All {len(models)} models completed in {total_duration:.1f}s")
     print()
@@ -247,18 +264,16 @@ def main():
         print(result)
         print()
     
-    # Save results to file
+    # Save results to file in one write instead of a handful per model
     output_file = Path("tmp/gemini-model-comparison.txt")
-    with open(output_file, 'w') as f:
-        f.write("Gemini Model Comparison for Changelog Generation\n")
-        f.write("=" * 60 + "\n\n")
-        
-        for model, result in results.items():
-            f.write(f"Model: {model}\n")
-            f.write("-" * 40 + "\n")
-            f.write(result + "\n\n")
-    
+    chunks = [f"Gemini Model Comparison for Changelog Generation\n{'=' * 60}\n\n".encode('utf-8')]
+    for model, result in results.items():
+        chunks.append(f"Model: {model}\n{'-' * 40}\n{result}\n\n".encode('utf-8'))
+
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    output_file.write_bytes(b"".join(chunks))
+
     print(f"💾 Results saved to: {output_file}")
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -5,16 +5,27 @@ Interactive testing of different Gemini models with changelog generation
 """
 
 import os
+import re
+import ssl
 import sys
-import json
 import time
-import urllib.request
+import asyncio
 import argparse
+
+import httpx
 from pathlib import Path
-from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# Color codes for beautiful terminal output
+try:
+    import ijson
+except ImportError:  # optional - fall back to parsing the full body
+    ijson = None
+
+from _common import AsyncByteReader, json_dumps, json_loads, load_env
+
+# Color codes for beautiful terminal output. Kept as a thin namespace
+# for anything importing Colors; call sites below use the module-level
+# _C_* bindings, which compile to LOAD_GLOBAL instead of an attribute
+# lookup per rendered line
 class Colors:
     RESET = '\033[0m'
     BOLD = '\033[1m'
@@ -39,14 +50,60 @@ class Colors:
     BRIGHT_CYAN = '\033[96m'
     BRIGHT_WHITE = '\033[97m'
 
-def print_colored(text: str, color: str = Colors.WHITE, bold: bool = False, dim: bool = False) -> None:
-    """Print colored text to terminal"""
+_C_RESET = Colors.RESET
+_C_BOLD = Colors.BOLD
+_C_DIM = Colors.DIM
+_C_RED = Colors.RED
+_C_GREEN = Colors.GREEN
+_C_YELLOW = Colors.YELLOW
+_C_CYAN = Colors.CYAN
+_C_WHITE = Colors.WHITE
+_C_BRIGHT_RED = Colors.BRIGHT_RED
+_C_BRIGHT_GREEN = Colors.BRIGHT_GREEN
+_C_BRIGHT_YELLOW = Colors.BRIGHT_YELLOW
+_C_BRIGHT_BLUE = Colors.BRIGHT_BLUE
+_C_BRIGHT_MAGENTA = Colors.BRIGHT_MAGENTA
+_C_BRIGHT_CYAN = Colors.BRIGHT_CYAN
+_C_BRIGHT_WHITE = Colors.BRIGHT_WHITE
+
+# bytes twins of the codes above, pre-encoded once so the hot result
+# path can write straight to sys.stdout.buffer and skip the text-IO
+# wrapper's per-call UTF-8 encode
+class ColorsB:
+    RESET = _C_RESET.encode()
+    BOLD = _C_BOLD.encode()
+    DIM = _C_DIM.encode()
+
+    RED = _C_RED.encode()
+    CYAN = _C_CYAN.encode()
+    WHITE = _C_WHITE.encode()
+    YELLOW = _C_YELLOW.encode()
+
+    BRIGHT_RED = _C_BRIGHT_RED.encode()
+    BRIGHT_BLUE = _C_BRIGHT_BLUE.encode()
+
+def bcolored(text: str, color_b: bytes, bold: bool = False, dim: bool = False) -> bytes:
+    """Build one colored output line as bytes for a buffered write"""
+    style = b""
+    if bold:
+        style += ColorsB.BOLD
+    if dim:
+        style += ColorsB.DIM
+    return style + color_b + text.encode() + ColorsB.RESET + b"\n"
+
+def print_colored(text: str, color: str = _C_WHITE, bold: bool = False, dim: bool = False,
+                  buf: list = None) -> None:
+    """Print colored text to terminal, or append it to buf for a batched write"""
     style = ""
     if bold:
-        style += Colors.BOLD
+        style += _C_BOLD
     if dim:
-        style += Colors.DIM
-    print(f"{style}{color}{text}{Colors.RESET}")
+        style += _C_DIM
+    line = f"{style}{color}{text}{_C_RESET}"
+    if buf is not None:
+        buf.append(line + "\n")
+    else:
+        print(line)
 
 # Available models (verified via API)
 MODELS = [
@@ -54,32 +111,71 @@ MODELS = [
     "gemini-2.5-flash"
 ]
 
-def load_env():
-    """Load environment variables from root .env file"""
-    dotenv_path = Path(__file__).parent.parent.parent / ".env"
-    env_vars = {}
-    if dotenv_path.exists():
-        with open(dotenv_path, "r") as f:
-            for line in f:
-                line = line.strip()
-                if line.startswith("#") or not line or "=" not in line:
-                    continue
-                key, _, value = line.partition("=")
-                value = value.strip('"\'')
-                env_vars[key.strip()] = value.strip()
-                os.environ[key.strip()] = value.strip()
-    return env_vars
+# Repo paths, resolved once: each .parent hop allocates and re-parses a
+# new PurePath, and resolve() keeps them correct if the script is run
+# through a symlink
+_ROOT = Path(__file__).resolve().parent.parent.parent
+_DOTENV = _ROOT / ".env"
+_TMP_DIR = _ROOT / "tmp"
+
+# One SSL context for the whole process: building a context re-reads
+# the system CA bundle from disk, so both clients share this one and
+# TLS session resumption works across them
+_SSL_CTX = ssl.create_default_context()
+
+_LIMITS = httpx.Limits(max_keepalive_connections=10, max_connections=10)
+
+# Connection failures are redone by the transport; 429/5xx responses
+# are retried by the _post wrappers below, since httpx has no
+# urllib3-style status-code Retry. Same policy _common.SESSION gets
+# from urllib3
+_RETRIES = 3
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+_BACKOFF_FACTOR = 0.5
+
+def _retry_delay(resp, attempt: int) -> float:
+    """Seconds to back off before retrying, honoring Retry-After"""
+    retry_after = resp.headers.get('Retry-After')
+    if retry_after is not None:
+        try:
+            return min(float(retry_after), 30.0)
+        except ValueError:
+            pass  # HTTP-date form - fall back to exponential backoff
+    return _BACKOFF_FACTOR * (2 ** attempt)
+
+_CLIENT = None
+
+def _client() -> "httpx.Client":
+    """Shared HTTP/2 client, built on first use
+
+    googleapis.com multiplexes concurrent requests over one TLS
+    connection, so every call shares a single handshake. Constructed
+    lazily instead of at import: http2=True raises ImportError when the
+    h2 extra is missing, which would take down even --help.
+    """
+    global _CLIENT
+    if _CLIENT is None:
+        _CLIENT = httpx.Client(
+            transport=httpx.HTTPTransport(
+                retries=_RETRIES,
+                http2=True,
+                limits=_LIMITS,
+                verify=_SSL_CTX,
+            ),
+            timeout=60.0,
+        )
+    return _CLIENT
 
 def save_env(env_vars: dict):
     """Save environment variables to .env file"""
-    dotenv_path = Path(__file__).parent.parent.parent / ".env"
-    with open(dotenv_path, "w") as f:
+    with open(_DOTENV, "w") as f:
         for key, value in env_vars.items():
             f.write(f"{key}={value}\n")
+    # The file changed on disk, so the memoized parse is stale
+    load_env.cache_clear()
 
-def get_changelog_prompt():
-    """Get the changelog generation prompt with dummy data"""
-    return """You are a technical changelog generator. Create a changelog entry based on git commits.
+# The changelog generation prompt with dummy data
+_PROMPT = """You are a technical changelog generator. Create a changelog entry based on git commits.
 
 REQUIREMENTS:
 - Use sections: Added, Changed, Fixed, Removed
@@ -97,100 +193,216 @@ feat: add model selection for Gemini API calls
 
 Generate a changelog entry for version 0.2.0 with date 2025-09-18."""
 
+def _request_url(model_name: str, api_key: str) -> str:
+    return f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent?key={api_key}"
+
+# The payload is identical for every model and every run, so it is
+# encoded once at import and the same bytes are shared by all workers
+_REQUEST_BODY: bytes = json_dumps({
+    "contents": [{
+        "parts": [{
+            "text": _PROMPT
+        }]
+    }],
+    "generationConfig": {
+        "temperature": 0.1,
+        "maxOutputTokens": 1000,
+    }
+})
+
+_HEADERS = {'Content-Type': 'application/json'}
+
+def _parse_api_response(result: dict, duration: float) -> dict:
+    """Turn a parsed generateContent response into a result dict"""
+    if 'candidates' in result and len(result['candidates']) > 0:
+        candidate = result['candidates'][0]
+
+        # Check finish reason first
+        finish_reason = candidate.get('finishReason', 'UNKNOWN')
+        if finish_reason == 'MAX_TOKENS':
+            output_text = f"Response truncated (hit token limit: {finish_reason})"
+        elif finish_reason == 'SAFETY':
+            output_text = f"Response blocked by safety filters: {finish_reason}"
+        elif finish_reason == 'STOP':
+            # Normal completion - optimistic extraction; the nested key
+            # checks are the exception, not the rule
+            try:
+                output_text = candidate['content']['parts'][0]['text'].strip()
+            except (KeyError, IndexError, TypeError):
+                try:
+                    output_text = candidate['parts'][0]['text'].strip()
+                except (KeyError, IndexError, TypeError):
+                    output_text = f"No text found (finish reason: {finish_reason})"
+        else:
+            output_text = f"Unexpected finish reason: {finish_reason}"
+
+        # Get token usage
+        usage = result.get('usageMetadata', {})
+        input_tokens = usage.get('promptTokenCount', 0)
+        output_tokens = usage.get('candidatesTokenCount', 0)
+
+        return {
+            'success': True,
+            'output': output_text,
+            'input_tokens': input_tokens,
+            'output_tokens': output_tokens,
+            'duration': duration,
+            'error': None
+        }
+    else:
+        return {
+            'success': False,
+            'error': 'No candidates in response',
+            'duration': duration
+        }
+
+def _post(url: str) -> "httpx.Response":
+    """POST the request body, retrying transient 429/5xx responses"""
+    for attempt in range(_RETRIES + 1):
+        resp = _client().post(url, content=_REQUEST_BODY, headers=_HEADERS)
+        if resp.status_code not in _RETRY_STATUSES or attempt == _RETRIES:
+            return resp
+        time.sleep(_retry_delay(resp, attempt))
+
+async def _post_async(client: "httpx.AsyncClient", url: str) -> "httpx.Response":
+    """Async twin of _post with the same status-retry policy"""
+    for attempt in range(_RETRIES + 1):
+        resp = await client.post(url, content=_REQUEST_BODY, headers=_HEADERS)
+        if resp.status_code not in _RETRY_STATUSES or attempt == _RETRIES:
+            return resp
+        await asyncio.sleep(_retry_delay(resp, attempt))
+
 def test_model(model_name: str, api_key: str) -> dict:
     """Test a specific model and return results"""
-    prompt = get_changelog_prompt()
-    
     start_time = time.time()
-    
+
     try:
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent?key={api_key}"
-        
-        data = {
-            "contents": [{
-                "parts": [{
-                    "text": prompt
-                }]
-            }],
-            "generationConfig": {
-                "temperature": 0.1,
-                "maxOutputTokens": 1000,
-            }
-        }
-        
-        req = urllib.request.Request(
-            url,
-            data=json.dumps(data).encode('utf-8'),
-            headers={'Content-Type': 'application/json'}
-        )
-        
-        with urllib.request.urlopen(req, timeout=60) as response:
-            result = json.loads(response.read().decode('utf-8'))
-        
+        resp = _post(_request_url(model_name, api_key))
+
         duration = time.time() - start_time
-        
-        if 'candidates' in result and len(result['candidates']) > 0:
-            candidate = result['candidates'][0]
-            
-            # Check finish reason first
-            finish_reason = candidate.get('finishReason', 'UNKNOWN')
-            if finish_reason == 'MAX_TOKENS':
-                output_text = f"Response truncated (hit token limit: {finish_reason})"
-            elif finish_reason == 'SAFETY':
-                output_text = f"Response blocked by safety filters: {finish_reason}"
-            elif finish_reason == 'STOP':
-                # Normal completion, try to extract text
-                if 'content' in candidate and 'parts' in candidate['content'] and len(candidate['content']['parts']) > 0:
-                    if 'text' in candidate['content']['parts'][0]:
-                        output_text = candidate['content']['parts'][0]['text'].strip()
-                    else:
-                        output_text = "No text in response content"
-                elif 'parts' in candidate and len(candidate['parts']) > 0:
-                    if 'text' in candidate['parts'][0]:
-                        output_text = candidate['parts'][0]['text'].strip()
-                    else:
-                        output_text = "No text in response parts"
-                else:
-                    output_text = f"No text found (finish reason: {finish_reason})"
-            else:
-                output_text = f"Unexpected finish reason: {finish_reason}"
-            
-            # Get token usage
-            usage = result.get('usageMetadata', {})
-            input_tokens = usage.get('promptTokenCount', 0)
-            output_tokens = usage.get('candidatesTokenCount', 0)
-            
-            return {
-                'success': True,
-                'output': output_text,
-                'input_tokens': input_tokens,
-                'output_tokens': output_tokens,
-                'duration': duration,
-                'error': None
-            }
-        else:
+
+        if resp.status_code != 200:
             return {
                 'success': False,
-                'error': 'No candidates in response',
+                'error': f"HTTP {resp.status_code}: {resp.text[:100]}...",
                 'duration': duration
             }
-            
-    except urllib.error.HTTPError as e:
+
+        return _parse_api_response(json_loads(resp.content), duration)
+
+    except Exception as e:
         duration = time.time() - start_time
-        error_body = e.read().decode('utf-8') if hasattr(e, 'read') else str(e)
         return {
             'success': False,
-            'error': f"HTTP {e.code}: {error_body[:100]}...",
+            'error': str(e)[:100],
+            'duration': duration
+        }
+
+# JSON paths _parse_api_response actually consumes, mapped to flat names
+_STREAM_FIELDS = {
+    'candidates.item.finishReason': 'finish_reason',
+    'candidates.item.content.parts.item.text': 'text',
+    'usageMetadata.promptTokenCount': 'input_tokens',
+    'usageMetadata.candidatesTokenCount': 'output_tokens',
+}
+
+async def _stream_api_response(response, duration: float) -> dict:
+    """Incrementally extract the needed fields instead of building the full dict tree
+
+    Stops reading as soon as all four fields are seen; everything else
+    in the body (safety ratings, the rest of the metadata) is never
+    materialized.
+    """
+    fields = {}
+    events = ijson.parse_async(AsyncByteReader(response.aiter_bytes()))
+    async for prefix, event, value in events:
+        key = _STREAM_FIELDS.get(prefix)
+        if key is not None:
+            fields[key] = value
+            if len(fields) == len(_STREAM_FIELDS):
+                break
+
+    if 'finish_reason' not in fields:
+        return {
+            'success': False,
+            'error': 'No candidates in response',
             'duration': duration
         }
+
+    # Rebuild the minimal response shape so the parsing stays in one place
+    candidate = {'finishReason': fields['finish_reason']}
+    if 'text' in fields:
+        candidate['content'] = {'parts': [{'text': fields['text']}]}
+
+    return _parse_api_response({
+        'candidates': [candidate],
+        'usageMetadata': {
+            'promptTokenCount': fields.get('input_tokens', 0),
+            'candidatesTokenCount': fields.get('output_tokens', 0),
+        }
+    }, duration)
+
+async def test_model_async(client: "httpx.AsyncClient", model_name: str, api_key: str) -> tuple:
+    """Async variant of test_model for the parallel path"""
+    print_colored(f"🚀 Starting {model_name}...", _C_BRIGHT_CYAN)
+    start_time = time.time()
+
+    try:
+        if ijson is not None:
+            for attempt in range(_RETRIES + 1):
+                async with client.stream('POST', _request_url(model_name, api_key),
+                                         content=_REQUEST_BODY, headers=_HEADERS) as resp:
+                    if resp.status_code in _RETRY_STATUSES and attempt < _RETRIES:
+                        # Drain so the connection is reusable, then back
+                        # off and retry like the other POST sites
+                        await resp.aread()
+                        delay = _retry_delay(resp, attempt)
+                        result = None
+                    elif resp.status_code != 200:
+                        error_body = (await resp.aread()).decode('utf-8', 'replace')
+                        duration = time.time() - start_time
+                        result = {
+                            'success': False,
+                            'error': f"HTTP {resp.status_code}: {error_body[:100]}...",
+                            'duration': duration
+                        }
+                    else:
+                        duration = time.time() - start_time
+                        result = await _stream_api_response(resp, duration)
+                if result is not None:
+                    break
+                await asyncio.sleep(delay)
+        else:
+            resp = await _post_async(client, _request_url(model_name, api_key))
+
+            duration = time.time() - start_time
+
+            if resp.status_code != 200:
+                result = {
+                    'success': False,
+                    'error': f"HTTP {resp.status_code}: {resp.text[:100]}...",
+                    'duration': duration
+                }
+            else:
+                result = _parse_api_response(json_loads(resp.content), duration)
+
     except Exception as e:
         duration = time.time() - start_time
-        return {
+        result = {
             'success': False,
             'error': str(e)[:100],
             'duration': duration
         }
 
+    # Persist and pre-format here so the fan-in loop in run_test only
+    # writes ready-made strings; one worker's formatting and disk I/O
+    # overlaps the others' network waits
+    result['filepath'] = save_output(model_name, result)
+    result['formatted'] = format_result(model_name, result)
+
+    print_colored(f"✅ Completed {model_name} in {duration:.1f}s", _C_BRIGHT_GREEN)
+    return model_name, result
+
 def format_duration(seconds: float) -> str:
     """Format duration for display"""
     if seconds < 1:
@@ -198,95 +410,112 @@ def format_duration(seconds: float) -> str:
     else:
         return f"{seconds:.1f}s"
 
+# The mkdir syscall is only issued the first time save_output runs
+_TMP_READY = False
+
 def save_output(model_name: str, result: dict):
     """Save test output to file"""
-    # Ensure tmp directory exists
-    tmp_dir = Path(__file__).parent.parent.parent / "tmp"
-    tmp_dir.mkdir(exist_ok=True)
-    
-    # Generate filename
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    global _TMP_READY
+    tmp_dir = _TMP_DIR
+    if not _TMP_READY:
+        tmp_dir.mkdir(exist_ok=True)
+        _TMP_READY = True
+
+    # Generate filename - time.strftime skips the datetime object allocation
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
     filename = f"{model_name}-test-{timestamp}.txt"
     filepath = tmp_dir / filename
     
-    # Write output
-    with open(filepath, "w") as f:
-        f.write(f"{model_name.upper()} TEST\n")
-        if result['success']:
-            f.write(f"Input: {result['input_tokens']} tokens\n")
-            f.write(f"Output: {result['output_tokens']} tokens\n")
-        f.write(f"Duration: {format_duration(result['duration'])}\n")
-        f.write("_" * 50 + "\n")
-        if result['success']:
-            f.write(result['output'])
-        else:
-            f.write(f"ERROR: {result['error']}")
-        f.write("\n" + "_" * 50 + "\n")
-    
+    # Build the whole file content and write it in one call
+    lines = [f"{model_name.upper()} TEST\n"]
+    if result['success']:
+        lines.append(f"Input: {result['input_tokens']} tokens\n")
+        lines.append(f"Output: {result['output_tokens']} tokens\n")
+    lines.append(f"Duration: {format_duration(result['duration'])}\n")
+    lines.append("_" * 50 + "\n")
+    if result['success']:
+        lines.append(result['output'])
+    else:
+        lines.append(f"ERROR: {result['error']}")
+    lines.append("\n" + "_" * 50 + "\n")
+
+    filepath.write_text(''.join(lines))
+
     return filepath
 
-def print_result(model_name: str, result: dict):
-    """Print formatted result"""
-    print_colored(f"🤖 {model_name.upper()} TEST", Colors.BRIGHT_BLUE, bold=True)
+def format_result(model_name: str, result: dict) -> bytes:
+    """Build the formatted result block as one bytes blob"""
+    buf = [bcolored(f"🤖 {model_name.upper()} TEST", ColorsB.BRIGHT_BLUE, bold=True)]
     if result['success']:
-        print_colored(f"📊 Input: {result['input_tokens']} tokens", Colors.CYAN)
-        print_colored(f"📤 Output: {result['output_tokens']} tokens", Colors.CYAN)
-    print_colored(f"⏱️  Duration: {format_duration(result['duration'])}", Colors.YELLOW)
-    print_colored("─" * 50, Colors.DIM)
+        buf.append(bcolored(f"📊 Input: {result['input_tokens']} tokens", ColorsB.CYAN))
+        buf.append(bcolored(f"📤 Output: {result['output_tokens']} tokens", ColorsB.CYAN))
+    buf.append(bcolored(f"⏱️  Duration: {format_duration(result['duration'])}", ColorsB.YELLOW))
+    buf.append(bcolored("─" * 50, ColorsB.DIM))
     if result['success']:
-        print_colored(result['output'], Colors.WHITE)
+        buf.append(bcolored(result['output'], ColorsB.WHITE))
     else:
-        print_colored(f"❌ ERROR: {result['error']}", Colors.BRIGHT_RED)
-    print_colored("─" * 50, Colors.DIM)
-    print()
+        buf.append(bcolored(f"❌ ERROR: {result['error']}", ColorsB.BRIGHT_RED))
+    buf.append(bcolored("─" * 50, ColorsB.DIM))
+    buf.append(b"\n")
+    return b"".join(buf)
 
-def test_model_parallel_wrapper(model, api_key):
-    """Wrapper function for parallel testing"""
-    print_colored(f"🚀 Starting {model}...", Colors.BRIGHT_CYAN)
-    start_time = time.time()
-    result = test_model(model, api_key)
-    duration = time.time() - start_time
-    print_colored(f"✅ Completed {model} in {duration:.1f}s", Colors.BRIGHT_GREEN)
-    return model, result
+def print_result(model_name: str, result: dict):
+    """Print formatted result in a single buffered stdout write"""
+    # Flush the text wrapper first so earlier print() output can't be
+    # reordered behind the raw byte write
+    sys.stdout.flush()
+    sys.stdout.buffer.write(format_result(model_name, result))
 
 def run_test(models: list, api_key: str, parallel: bool = True):
     """Run tests for specified models (optionally in parallel)"""
     results = []
-    
+
     if parallel and len(models) > 1:
-        print_colored(f"🚀 Running {len(models)} models in parallel...", Colors.BRIGHT_MAGENTA, bold=True)
+        print_colored(f"🚀 Running {len(models)} models in parallel...", _C_BRIGHT_MAGENTA, bold=True)
         print()
         
         start_time = time.time()
         
-        # Run all models in parallel
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            # Submit all tasks
-            future_to_model = {
-                executor.submit(test_model_parallel_wrapper, model, api_key): model 
-                for model in models
-            }
-            
-            # Collect results as they complete
-            for future in as_completed(future_to_model):
-                model, result = future.result()
-                results.append((model, result))
+        # Run all models concurrently on the event loop - the work is pure
+        # network wait, so coroutines replace the worker threads. The
+        # semaphore right-sizes the fan-out: short runs spawn exactly
+        # len(models) in-flight requests, and if the model list grows the
+        # API never sees more than 8 at once
+        async def _run_all():
+            sem = asyncio.Semaphore(min(len(models), 8))
+
+            async def _bounded(model):
+                async with sem:
+                    return await test_model_async(client, model, api_key)
+
+            async with httpx.AsyncClient(
+                transport=httpx.AsyncHTTPTransport(
+                    retries=_RETRIES,
+                    http2=True,
+                    limits=_LIMITS,
+                    verify=_SSL_CTX,
+                ),
+                timeout=60.0,
+            ) as client:
+                return await asyncio.gather(*[_bounded(model) for model in models])
+
+        results.extend(asyncio.run(_run_all()))
         
         total_duration = time.time() - start_time
         print()
-        print_colored(f"🎉 All {len(models)} models completed in {total_duration:.1f}s", Colors.BRIGHT_GREEN, bold=True)
+        print_colored(f"🎉 All {len(models)} models completed in {total_duration:.1f}s", _C_BRIGHT_GREEN, bold=True)
         print()
         
-        # Print all results
+        # Print all results - already formatted and saved by the workers
         for model, result in results:
-            print_result(model, result)
-            filepath = save_output(model, result)
-            print_colored(f"💾 Saved to: {filepath}", Colors.GREEN)
+            sys.stdout.flush()
+            sys.stdout.buffer.write(result.pop('formatted'))
+            print_colored(f"💾 Saved to: {result.pop('filepath')}", _C_GREEN)
             print()
     else:
         # Sequential execution (original behavior)
         for model in models:
-            print_colored(f"🧪 Testing {model}...", Colors.BRIGHT_CYAN)
+            print_colored(f"🧪 Testing {model}...", _C_BRIGHT_CYAN)
             result = test_model(model, api_key)
             results.append((model, result))
             
@@ -295,7 +524,7 @@ def run_test(models: list, api_key: str, parallel: bool = True):
             
             # Save to file
             filepath = save_output(model, result)
-            print_colored(f"💾 Saved to: {filepath}", Colors.GREEN)
+            print_colored(f"💾 Saved to: {filepath}", _C_GREEN)
             print()
     
     return results
@@ -307,14 +536,14 @@ def get_current_model():
 
 def update_default_model():
     """Interactive model selection to update .env"""
-    print_colored("🎯 Available models:", Colors.BRIGHT_YELLOW, bold=True)
+    print_colored("🎯 Available models:", _C_BRIGHT_YELLOW, bold=True)
     for i, model in enumerate(MODELS, 1):
-        print_colored(f"  [{i}] {model}", Colors.BRIGHT_WHITE)
+        print_colored(f"  [{i}] {model}", _C_BRIGHT_WHITE)
     
     while True:
         try:
             print()
-            choice = input(f"{Colors.BRIGHT_CYAN}Select model (1-{len(MODELS)}): {Colors.RESET}").strip()
+            choice = input(f"{_C_BRIGHT_CYAN}Select model (1-{len(MODELS)}): {_C_RESET}").strip()
             idx = int(choice) - 1
             if 0 <= idx < len(MODELS):
                 selected_model = MODELS[idx]
@@ -324,84 +553,83 @@ def update_default_model():
                 env_vars['GEMINI_MODEL'] = selected_model
                 save_env(env_vars)
                 
-                print_colored(f"✅ Updated GEMINI_MODEL to: {selected_model}", Colors.BRIGHT_GREEN)
+                print_colored(f"✅ Updated GEMINI_MODEL to: {selected_model}", _C_BRIGHT_GREEN)
                 return
             else:
-                print_colored("❌ Invalid selection", Colors.BRIGHT_RED)
+                print_colored("❌ Invalid selection", _C_BRIGHT_RED)
         except (ValueError, KeyboardInterrupt):
-            print_colored("❌ Invalid input", Colors.BRIGHT_RED)
+            print_colored("❌ Invalid input", _C_BRIGHT_RED)
             return
 
 def select_models() -> list:
     """Interactive model selection"""
-    print_colored("🎯 Select models to test:", Colors.BRIGHT_YELLOW, bold=True)
+    print_colored("🎯 Select models to test:", _C_BRIGHT_YELLOW, bold=True)
     for i, model in enumerate(MODELS, 1):
-        print_colored(f"  [{i}] {model}", Colors.BRIGHT_WHITE)
+        print_colored(f"  [{i}] {model}", _C_BRIGHT_WHITE)
     
     print()
-    print_colored("💡 Enter model numbers separated by spaces (e.g., 1 3 5):", Colors.CYAN)
-    print_colored("   Or press Enter for all models", Colors.DIM)
+    print_colored("💡 Enter model numbers separated by spaces (e.g., 1 3 5):", _C_CYAN)
+    print_colored("   Or press Enter for all models", _C_DIM)
     
-    choice = input(f"{Colors.BRIGHT_CYAN}Selection: {Colors.RESET}").strip()
+    choice = input(f"{_C_BRIGHT_CYAN}Selection: {_C_RESET}").strip()
     
     if not choice:
         return MODELS
-    
-    try:
-        indices = [int(x) - 1 for x in choice.split()]
-        selected = [MODELS[i] for i in indices if 0 <= i < len(MODELS)]
-        if selected:
-            return selected
-        else:
-            print_colored("❌ No valid selections", Colors.BRIGHT_RED)
-            return []
-    except ValueError:
-        print_colored("❌ Invalid input", Colors.BRIGHT_RED)
+
+    # Pull the numbers out with one regex pass; unlike int() over
+    # split(), this tolerates commas and validates instead of silently
+    # dropping out-of-range entries
+    nums = [int(n) for n in re.findall(r'\d+', choice)]
+    if not nums:
+        print_colored("❌ Invalid input", _C_BRIGHT_RED)
+        return []
+    if not all(1 <= n <= len(MODELS) for n in nums):
+        print_colored("❌ No valid selections", _C_BRIGHT_RED)
         return []
+    return [MODELS[n - 1] for n in nums]
 
 def interactive_menu():
     """Interactive menu mode"""
     while True:
-        print()
-        print_colored("╔══════════════════════════════════════════════════════════╗", Colors.BRIGHT_BLUE, bold=True)
-        print_colored("║                                                          ║", Colors.BRIGHT_BLUE, bold=True)
-        print_colored("║  🤖 Gemini Model Testing Suite                         ║", Colors.BRIGHT_CYAN, bold=True)
-        print_colored("║                                                          ║", Colors.BRIGHT_BLUE, bold=True)
-        print_colored("╚══════════════════════════════════════════════════════════╝", Colors.BRIGHT_BLUE, bold=True)
-        print()
-        
-        print_colored("📋 Available Options:", Colors.BRIGHT_YELLOW, bold=True)
-        print_colored("  [1] 🚀 Run default model", Colors.BRIGHT_WHITE)
-        print_colored("  [2] 👁️  View current default model", Colors.BRIGHT_WHITE)
-        print_colored("  [3] ⚙️  Update default model", Colors.BRIGHT_WHITE)
-        print_colored("  [4] 🎯 Run test with specific model(s)", Colors.BRIGHT_WHITE)
-        print_colored("  [5] 🌟 Run tests with all models (parallel)", Colors.BRIGHT_WHITE)
-        print_colored("  [6] 🐌 Run tests with all models (sequential)", Colors.BRIGHT_WHITE)
-        print_colored("  [0] 👋 Exit", Colors.DIM)
-        
-        print()
-        choice = input(f"{Colors.BRIGHT_CYAN}Select option: {Colors.RESET}").strip()
+        buf = ["\n"]
+        print_colored("╔══════════════════════════════════════════════════════════╗", _C_BRIGHT_BLUE, bold=True, buf=buf)
+        print_colored("║                                                          ║", _C_BRIGHT_BLUE, bold=True, buf=buf)
+        print_colored("║  🤖 Gemini Model Testing Suite                         ║", _C_BRIGHT_CYAN, bold=True, buf=buf)
+        print_colored("║                                                          ║", _C_BRIGHT_BLUE, bold=True, buf=buf)
+        print_colored("╚══════════════════════════════════════════════════════════╝", _C_BRIGHT_BLUE, bold=True, buf=buf)
+        buf.append("\n")
+        print_colored("📋 Available Options:", _C_BRIGHT_YELLOW, bold=True, buf=buf)
+        print_colored("  [1] 🚀 Run default model", _C_BRIGHT_WHITE, buf=buf)
+        print_colored("  [2] 👁️  View current default model", _C_BRIGHT_WHITE, buf=buf)
+        print_colored("  [3] ⚙️  Update default model", _C_BRIGHT_WHITE, buf=buf)
+        print_colored("  [4] 🎯 Run test with specific model(s)", _C_BRIGHT_WHITE, buf=buf)
+        print_colored("  [5] 🌟 Run tests with all models (parallel)", _C_BRIGHT_WHITE, buf=buf)
+        print_colored("  [6] 🐌 Run tests with all models (sequential)", _C_BRIGHT_WHITE, buf=buf)
+        print_colored("  [0] 👋 Exit", _C_DIM, buf=buf)
+        buf.append("\n")
+        sys.stdout.write(''.join(buf))
+        choice = input(f"{_C_BRIGHT_CYAN}Select option: {_C_RESET}").strip()
         
         if choice == "0":
-            print_colored("👋 Goodbye!", Colors.BRIGHT_YELLOW)
+            print_colored("👋 Goodbye!", _C_BRIGHT_YELLOW)
             break
         elif choice == "1":
             current_model = get_current_model()
             if current_model == "Not set":
-                print_colored("❌ No default model set. Use option [3] to set one.", Colors.BRIGHT_RED)
+                print_colored("❌ No default model set. Use option [3] to set one.", _C_BRIGHT_RED)
             else:
                 api_key = os.getenv('GEMINI_KEY')
                 if not api_key:
-                    print_colored("❌ GEMINI_KEY not found in .env", Colors.BRIGHT_RED)
+                    print_colored("❌ GEMINI_KEY not found in .env", _C_BRIGHT_RED)
                 else:
-                    print_colored(f"🚀 Running default model: {current_model}", Colors.BRIGHT_GREEN)
+                    print_colored(f"🚀 Running default model: {current_model}", _C_BRIGHT_GREEN)
                     run_test([current_model], api_key)
         elif choice == "2":
             current_model = get_current_model()
             if current_model == "Not set":
-                print_colored("⚠️  Current default model: Not set", Colors.BRIGHT_YELLOW)
+                print_colored("⚠️  Current default model: Not set", _C_BRIGHT_YELLOW)
             else:
-                print_colored(f"✅ Current default model: {current_model}", Colors.BRIGHT_GREEN)
+                print_colored(f"✅ Current default model: {current_model}", _C_BRIGHT_GREEN)
         elif choice == "3":
             update_default_model()
         elif choice == "4":
@@ -409,26 +637,26 @@ def interactive_menu():
             if selected_models:
                 api_key = os.getenv('GEMINI_KEY')
                 if not api_key:
-                    print_colored("❌ GEMINI_KEY not found in .env", Colors.BRIGHT_RED)
+                    print_colored("❌ GEMINI_KEY not found in .env", _C_BRIGHT_RED)
                 else:
-                    print_colored(f"🎯 Running {len(selected_models)} selected model(s)", Colors.BRIGHT_GREEN)
+                    print_colored(f"🎯 Running {len(selected_models)} selected model(s)", _C_BRIGHT_GREEN)
                     run_test(selected_models, api_key)
         elif choice == "5":
             api_key = os.getenv('GEMINI_KEY')
             if not api_key:
-                print_colored("❌ GEMINI_KEY not found in .env", Colors.BRIGHT_RED)
+                print_colored("❌ GEMINI_KEY not found in .env", _C_BRIGHT_RED)
             else:
-                print_colored(f"🌟 Running all {len(MODELS)} models in parallel", Colors.BRIGHT_GREEN)
+                print_colored(f"🌟 Running all {len(MODELS)} models in parallel", _C_BRIGHT_GREEN)
                 run_test(MODELS, api_key, parallel=True)
         elif choice == "6":
             api_key = os.getenv('GEMINI_KEY')
             if not api_key:
-                print_colored("❌ GEMINI_KEY not found in .env", Colors.BRIGHT_RED)
+                print_colored("❌ GEMINI_KEY not found in .env", _C_BRIGHT_RED)
             else:
-                print_colored(f"🐌 Running all {len(MODELS)} models sequentially", Colors.BRIGHT_GREEN)
+                print_colored(f"🐌 Running all {len(MODELS)} models sequentially", _C_BRIGHT_GREEN)
                 run_test(MODELS, api_key, parallel=False)
         else:
-            print_colored("❌ Invalid option", Colors.BRIGHT_RED)
+            print_colored("❌ Invalid option", _C_BRIGHT_RED)
 
 def main():
     """Main function"""
@@ -446,7 +674,7 @@ def main():
     # Get API key
     api_key = os.getenv('GEMINI_KEY')
     if not api_key:
-        print_colored("❌ GEMINI_KEY not found in .env file", Colors.BRIGHT_RED)
+        print_colored("❌ GEMINI_KEY not found in .env file", _C_BRIGHT_RED)
         sys.exit(1)
     
     if args.interactive:
@@ -454,18 +682,18 @@ def main():
     elif args.all:
         parallel = not args.sequential  # Default to parallel unless --sequential is specified
         if parallel:
-            print_colored(f"🌟 Running all {len(MODELS)} models in parallel", Colors.BRIGHT_GREEN)
+            print_colored(f"🌟 Running all {len(MODELS)} models in parallel", _C_BRIGHT_GREEN)
         else:
-            print_colored(f"🐌 Running all {len(MODELS)} models sequentially", Colors.BRIGHT_GREEN)
+            print_colored(f"🐌 Running all {len(MODELS)} models sequentially", _C_BRIGHT_GREEN)
         run_test(MODELS, api_key, parallel=parallel)
     else:
         # Default mode - run with current model
         current_model = os.getenv('GEMINI_MODEL')
         if not current_model:
-            print_colored("⚠️  GEMINI_MODEL not set in .env. Using gemini-2.5-flash as default.", Colors.BRIGHT_YELLOW)
+            print_colored("⚠️  GEMINI_MODEL not set in .env. Using gemini-2.5-flash as default.", _C_BRIGHT_YELLOW)
             current_model = "gemini-2.5-flash"
         
-        print_colored(f"🚀 Running model: {current_model}", Colors.BRIGHT_GREEN)
+        print_colored(f"🚀 Running model: {current_model}", _C_BRIGHT_GREEN)
         run_test([current_model], api_key, parallel=False)  # Single model doesn't need parallel
 
 if __name__ == "__main__":